@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Benchmark matrix for the llama.cpp backend.
+
+For every combination of model file and llama-server settings listed in a
+matrix file (see bench_matrix.example.json), start llama-server, wait until
+it reports ready, run the extraction fixture corpus (fixtures.json) through
+the Python front end and measure throughput, latency percentiles, peak RSS
+of the server and accuracy against the expected values.
+
+    python3 bench_matrix.py bench_matrix.example.json --output bench.json
+
+The defaults and the example matrix are for the Docker image, where the
+runner is copied to /app next to llama.cpp and the Q8_0 model:
+
+    docker exec -it <container> python3 bench_matrix.py bench_matrix.example.json
+
+The image only ships gemma-3-4b-it-Q8_0.gguf. To compare other quantizations,
+mount a directory of GGUF files (docker run -v ~/models:/app/models/extra ...)
+and list them under "models". On the host, set "llama_server" and "models" to
+host paths in the matrix file instead.
+
+The front end (entrypoint.py) must be running and talking to the port the
+backend is started on, and nothing else may listen on that port: stop the
+llama-server started by start.sh first, e.g. docker exec <container> pkill
+llama-server (the runner refuses to start when the port is taken). Requests are sent with "similarity": false so that
+near-duplicate reuse does not skew the measurements. The output of each
+llama-server run is written to log_dir (bench_logs/ by default) and the path
+is recorded in the row as "log".
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+MATRIX_KEYS = ('model', 'threads', 'parallel', 'ctx_size', 'batch_size', 'flash_attn')
+
+DEFAULTS = {
+    'llama_server': '/app/llama.cpp/build/bin/llama-server',
+    'host': '127.0.0.1',
+    'port': 8080,
+    'service_url': 'http://localhost:8081',
+    'fixtures': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures.json'),
+    'repeat': 1,
+    'ready_timeout': 600,
+    'request_timeout': 600,
+    'extra_args': [],
+    'log_dir': 'bench_logs',
+}
+
+
+def quantization(model: str) -> str:
+    """Quantization label from a GGUF file name, e.g. Q8_0 or Q4_K_M."""
+    match = re.search(r'(I?Q\d+(?:_[A-Z0-9]+)*|F16|BF16|F32)', os.path.basename(model), re.IGNORECASE)
+    return match.group(1).upper() if match else '?'
+
+
+def combinations(matrix: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Cartesian product of the matrix values. Missing keys use llama-server's default."""
+    axes = []
+    for key in MATRIX_KEYS:
+        values = matrix.get('models' if key == 'model' else key, [None])
+        axes.append(values if isinstance(values, list) else [values])
+    return [dict(zip(MATRIX_KEYS, values)) for values in itertools.product(*axes)]
+
+
+def server_command(config: Dict[str, Any], settings: Dict[str, Any]) -> List[str]:
+    command = [config['llama_server'], '-m', settings['model'], '--host', config['host'], '--port', str(config['port'])]
+    if settings['threads'] is not None:
+        command += ['--threads', str(settings['threads'])]
+    if settings['parallel'] is not None:
+        command += ['--parallel', str(settings['parallel'])]
+    if settings['ctx_size'] is not None:
+        command += ['--ctx-size', str(settings['ctx_size'])]
+    if settings['batch_size'] is not None:
+        command += ['--batch-size', str(settings['batch_size'])]
+    if settings['flash_attn'] is not None:
+        command += ['--flash-attn', 'on' if settings['flash_attn'] else 'off']
+    return command + list(config['extra_args'])
+
+
+def port_in_use(config: Dict[str, Any]) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.settimeout(2)
+        return probe.connect_ex((config['host'], config['port'])) == 0
+
+
+def wait_until_ready(config: Dict[str, Any], process: subprocess.Popen) -> bool:
+    """
+    Poll llama-server's /health until it answers 200 (it returns 503 while
+    loading). The spawned process must still be alive afterwards, otherwise
+    the answer came from another server on the same port.
+    """
+    url = f"http://{config['host']}:{config['port']}/health"
+    deadline = time.monotonic() + config['ready_timeout']
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                time.sleep(1)
+                return process.poll() is None
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(1)
+    return False
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of a process in MiB, read from /proc (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def value_at(data: Any, path: str) -> Any:
+    """Follow a test.py style path such as 'gigs.[0].date' into a result."""
+    current = data
+    for part in path.split('.'):
+        if part.startswith('[') and part.endswith(']'):
+            index = int(part[1:-1])
+            if not isinstance(current, list) or not 0 <= index < len(current):
+                return None
+            current = current[index]
+        elif isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            return None
+    if isinstance(current, dict):
+        current = current.get('value')
+    return current
+
+
+def score(result: Dict[str, Any], expected: Dict[str, str]) -> int:
+    """Number of expected values found (case-insensitive substring match, as in test.py)."""
+    if not isinstance(result, dict) or 'error' in result:
+        return 0
+    return sum(
+        1 for path, value in expected.items()
+        if value_at(result, path) is not None and value.lower() in str(value_at(result, path)).lower()
+    )
+
+
+def percentile(values: List[float], rank: float) -> Optional[float]:
+    if not values:
+        return None
+    # Nearest-rank method
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(rank / 100 * len(ordered)) - 1))]
+
+
+def run_corpus(config: Dict[str, Any], fixtures: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    session = requests.Session()
+    url = f"{config['service_url'].rstrip('/')}/entity-extraction"
+
+    def run(case):
+        start = time.monotonic()
+        try:
+            response = session.post(url, json={
+                'text': case['text'],
+                'entities': case['entities'],
+                'similarity': False
+            }, timeout=config['request_timeout'])
+            result = response.json() if response.status_code == 200 else {'error': response.status_code}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            result = {'error': str(e)}
+        return time.monotonic() - start, score(result, case['expected']), 'error' in result
+
+    cases = fixtures * config['repeat']
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run, cases))
+    elapsed = time.monotonic() - start
+    session.close()
+
+    latencies = [latency for latency, _, _ in outcomes]
+    found = sum(found for _, found, _ in outcomes)
+    total = sum(len(case['expected']) for case in cases)
+    return {
+        'requests': len(cases),
+        'errors': sum(1 for _, _, error in outcomes if error),
+        'elapsed_s': elapsed,
+        'throughput_per_min': len(cases) / elapsed * 60 if elapsed else None,
+        'p50_s': percentile(latencies, 50),
+        'p95_s': percentile(latencies, 95),
+        'p99_s': percentile(latencies, 99),
+        'accuracy': found / total if total else None,
+    }
+
+
+def run_combination(config: Dict[str, Any], settings: Dict[str, Any], fixtures: List[Dict[str, Any]],
+                    index: int = 0) -> Dict[str, Any]:
+    row = {**settings, 'quantization': quantization(settings['model'])}
+    if not os.path.isfile(settings['model']):
+        row['error'] = f"model file {settings['model']} not found"
+        return row
+    if port_in_use(config):
+        row['error'] = f"port {config['port']} is already in use"
+        return row
+    command = server_command(config, settings)
+    print(f"\n▶ {' '.join(command)}", file=sys.stderr)
+
+    # llama-server's output is kept so a combination that fails to load can be diagnosed
+    os.makedirs(config['log_dir'], exist_ok=True)
+    name = os.path.splitext(os.path.basename(settings['model']))[0]
+    row['log'] = os.path.join(config['log_dir'], f'{index:03d}-{name}.log')
+    started = time.monotonic()
+    with open(row['log'], 'wb') as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        if not wait_until_ready(config, process):
+            row['error'] = f"llama-server not ready (exit code {process.poll()}), see {row['log']}"
+            return row
+        row['load_s'] = time.monotonic() - started
+        row.update(run_corpus(config, fixtures, settings['parallel'] or 1))
+        row['peak_rss_mb'] = peak_rss_mb(process.pid)
+        if row['accuracy'] is not None and row['throughput_per_min']:
+            # Correct fields per minute: the figure to maximise
+            row['accuracy_per_min'] = row['accuracy'] * row['throughput_per_min']
+        return row
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    """Markdown comparison table, best accuracy per minute first."""
+    columns = [
+        ('model', 'model'), ('quant', 'quantization'), ('threads', 'threads'), ('parallel', 'parallel'),
+        ('ctx', 'ctx_size'), ('batch', 'batch_size'), ('fa', 'flash_attn'), ('req/min', 'throughput_per_min'),
+        ('p50 s', 'p50_s'), ('p95 s', 'p95_s'), ('p99 s', 'p99_s'), ('peak RSS MiB', 'peak_rss_mb'),
+        ('accuracy', 'accuracy'), ('acc×req/min', 'accuracy_per_min'), ('errors', 'errors'),
+    ]
+
+    def cell(row, key):
+        value = row.get(key)
+        if key == 'model':
+            return os.path.basename(value)
+        if value is None:
+            return row.get('error', '-') if key == 'errors' else '-'
+        if isinstance(value, float):
+            return f'{value:.1%}' if key == 'accuracy' else f'{value:.2f}'
+        return str(value)
+
+    ordered = sorted(rows, key=lambda row: row.get('accuracy_per_min') or 0, reverse=True)
+    lines = [
+        '| ' + ' | '.join(title for title, _ in columns) + ' |',
+        '|' + '|'.join('---' for _ in columns) + '|',
+    ]
+    lines += ['| ' + ' | '.join(cell(row, key) for _, key in columns) + ' |' for row in ordered]
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description='Benchmark llama-server models and settings on the extraction corpus.')
+    parser.add_argument('matrix', help='JSON matrix file (see bench_matrix.example.json)')
+    parser.add_argument('--output', help='write the raw results to this JSON file')
+    args = parser.parse_args(argv)
+
+    with open(args.matrix, encoding='utf-8') as matrix_file:
+        matrix = json.load(matrix_file)
+    config = {**DEFAULTS, **{key: value for key, value in matrix.items() if key in DEFAULTS}}
+    with open(config['fixtures'], encoding='utf-8') as fixtures_file:
+        fixtures = json.load(fixtures_file)
+
+    if not os.path.isfile(config['llama_server']):
+        sys.exit(f"llama-server not found at {config['llama_server']}, set \"llama_server\" in the matrix file")
+    if port_in_use(config):
+        sys.exit(f"Port {config['port']} is already in use, stop the llama-server started by start.sh first")
+
+    rows = []
+    for index, settings in enumerate(combinations(matrix)):
+        rows.append(run_combination(config, settings, fixtures, index))
+        if args.output:
+            # Rewritten after each combination so a long run can be interrupted
+            with open(args.output, 'w', encoding='utf-8') as output:
+                json.dump(rows, output, indent=2)
+
+    print(format_table(rows))
+
+
+if __name__ == '__main__':
+    main()
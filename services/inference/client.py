@@ -0,0 +1,329 @@
+"""
+Python client for the entity extraction service.
+
+    from client import EntityExtractionClient
+
+    with EntityExtractionClient("http://localhost:8081") as client:
+        result = client.extract(email_text, entity_types)
+        results = client.extract_many([(text, entity_types) for text in mails])
+
+Requests go through a pooled keep-alive session and are retried with
+exponential backoff and jitter, honouring the server's Retry-After header.
+GETs are retried on connection errors, timeouts and 429/502/503/504. POSTs
+start an inference the server keeps running after a timeout, so they are
+only retried when the request never reached the server (connection refused,
+connect timeout) or on 429/503. Batches run concurrently and use
+the asynchronous job API (POST /jobs) when the server supports it, falling
+back to /entity-extraction otherwise. Results can be kept in an in-memory
+LRU cache and/or a SQLite file shared between runs.
+
+AsyncEntityExtractionClient exposes the same API as coroutines.
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+RETRY_STATUSES = (429, 502, 503, 504)
+# Statuses meaning a POST was not processed, so it is safe to send it again
+POST_RETRY_STATUSES = (429, 503)
+TERMINAL_JOB_STATUSES = ("done", "failed")
+
+
+class EntityExtractionError(Exception):
+    """Raised when the service cannot be reached or answers with an error status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: Any = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class ResultCache:
+    """LRU cache of extraction results, optionally persisted to a SQLite file."""
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+            self._connection.commit()
+
+    @staticmethod
+    def key(text: str, entity_types: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps([text, entity_types], sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if self._connection is not None:
+                row = self._connection.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    return result
+        return None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._remember(key, result)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)", (key, json.dumps(result)))
+                self._connection.commit()
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class EntityExtractionClient:
+    """Synchronous, thread-safe client for the entity extraction service."""
+
+    def __init__(self, base_url: str = "http://localhost:8081", timeout: float = 300,
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 30,
+                 pool_size: int = 10, cache_size: int = 0, cache_path: Optional[str] = None,
+                 use_jobs: Any = "auto", job_poll: float = 30):
+        """
+        use_jobs is "auto" (batches use the job API when the server has it),
+        True (every extraction goes through the job API) or False (never).
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.use_jobs = use_jobs
+        self.job_poll = job_poll
+        self.cache = ResultCache(cache_size, cache_path) if cache_size > 0 or cache_path else None
+        self._jobs_supported = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Exponential backoff with full jitter, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                try:
+                    retry_at = email.utils.parsedate_to_datetime(retry_after).timestamp()
+                    delay = max(delay, retry_at - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return delay
+
+    def _request(self, method: str, path: str, accept: Tuple[int, ...] = (200,), **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures. Returns responses with an accepted status."""
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else POST_RETRY_STATUSES
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries or not (idempotent or _never_sent(e)):
+                    raise EntityExtractionError(f"HTTP request failed: {str(e)}") from e
+            except requests.exceptions.RequestException as e:
+                raise EntityExtractionError(f"HTTP request failed: {str(e)}") from e
+            else:
+                if response.status_code in accept:
+                    return response
+                if response.status_code not in retry_statuses or attempt == self.max_retries:
+                    raise EntityExtractionError(
+                        f"{method} {path} returned {response.status_code}",
+                        status_code=response.status_code,
+                        body=_json_or_text(response)
+                    )
+            time.sleep(self._retry_delay(attempt, response))
+
+    def jobs_supported(self) -> bool:
+        """Whether the server exposes the job API, probed once with GET /jobs."""
+        if self._jobs_supported is None:
+            try:
+                self._request("GET", "/jobs", timeout=min(self.timeout, 10))
+                self._jobs_supported = True
+            except EntityExtractionError as e:
+                if e.status_code is None:
+                    raise
+                self._jobs_supported = False
+        return self._jobs_supported
+
+    def _should_use_jobs(self, batch: bool) -> bool:
+        if self.use_jobs is True:
+            return True
+        if self.use_jobs == "auto" and batch:
+            return self.jobs_supported()
+        return False
+
+    def extract(self, text: str, entity_types: Dict[str, Any], priority: Any = "interactive") -> Dict[str, Any]:
+        """Extract entities from one mail."""
+        return self._extract(text, entity_types, priority, batch=False)
+
+    def _extract(self, text: str, entity_types: Dict[str, Any], priority: Any, batch: bool) -> Dict[str, Any]:
+        key = None
+        if self.cache is not None:
+            key = ResultCache.key(text, entity_types)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        if self._should_use_jobs(batch):
+            job = self.wait_for_job(self.submit_job(text, entity_types, priority=priority)["id"])
+            if job["status"] != "done":
+                raise EntityExtractionError(f"Job {job['id']} failed", status_code=job.get("status_code"), body=job.get("result"))
+            result = job["result"]
+        else:
+            response = self._request("POST", "/entity-extraction", json={"text": text, "entities": entity_types})
+            try:
+                result = response.json()
+            except ValueError as e:
+                raise EntityExtractionError(f"Invalid JSON response: {str(e)}") from e
+
+        if key is not None and "error" not in result:
+            self.cache.set(key, result)
+        return result
+
+    def extract_many(self, items: Iterable[Tuple[str, Dict[str, Any]]], priority: Any = "bulk",
+                     concurrency: Optional[int] = None) -> List[Any]:
+        """
+        Extract entities from many (text, entity_types) pairs concurrently.
+
+        Results are returned in input order; an item that failed is returned
+        as its EntityExtractionError instead of raising for the whole batch.
+        """
+        def run(item):
+            try:
+                return self._extract(item[0], item[1], priority, batch=True)
+            except EntityExtractionError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=concurrency or self.pool_size) as executor:
+            return list(executor.map(run, items))
+
+    def submit_job(self, text: str, entity_types: Dict[str, Any], priority: Any = "normal",
+                   callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Queue an extraction job and return it without waiting for the result."""
+        payload = {"text": text, "entities": entity_types, "priority": priority}
+        if callback_url:
+            payload["callback_url"] = callback_url
+        return self._request("POST", "/jobs", accept=(202,), json=payload).json()
+
+    def get_job(self, job_id: str, wait: float = 0) -> Dict[str, Any]:
+        """Fetch a job, long-polling up to `wait` seconds for it to finish."""
+        return self._request("GET", f"/jobs/{job_id}", params={"wait": wait}, timeout=self.timeout + wait).json()
+
+    def wait_for_job(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Long-poll a job until it is finished. Raises if `timeout` seconds elapse first."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self.job_poll
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            job = self.get_job(job_id, wait=wait)
+            if job["status"] in TERMINAL_JOB_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise EntityExtractionError(f"Job {job_id} still {job['status']} after {timeout}s")
+
+
+class AsyncEntityExtractionClient:
+    """asyncio front end to EntityExtractionClient, sharing its connection pool."""
+
+    def __init__(self, base_url: str = "http://localhost:8081", **kwargs):
+        self.client = EntityExtractionClient(base_url, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=self.client.pool_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def extract(self, text: str, entity_types: Dict[str, Any], priority: Any = "interactive") -> Dict[str, Any]:
+        return await self._run(self.client.extract, text, entity_types, priority)
+
+    async def extract_many(self, items: Iterable[Tuple[str, Dict[str, Any]]], priority: Any = "bulk") -> List[Any]:
+        async def run(item):
+            try:
+                return await self._run(self.client._extract, item[0], item[1], priority, True)
+            except EntityExtractionError as e:
+                return e
+
+        return await asyncio.gather(*(run(item) for item in items))
+
+    async def submit_job(self, text: str, entity_types: Dict[str, Any], priority: Any = "normal",
+                         callback_url: Optional[str] = None) -> Dict[str, Any]:
+        return await self._run(self.client.submit_job, text, entity_types, priority, callback_url)
+
+    async def wait_for_job(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self._run(self.client.wait_for_job, job_id, timeout)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+
+def _never_sent(error: requests.exceptions.RequestException) -> bool:
+    """Whether a request failed before reaching the server, so sending it again cannot duplicate work."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _json_or_text(response: requests.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
@@ -1,24 +1,49 @@
 from flask import Flask, request, jsonify
 import requests
 import json
+import os
 import re
+import time
+
+from jobs import JobQueue, resolve_priority, validate_callback_url
+from profiling import SamplingProfiler, SlowRequestLog, mark_stage
+from similarity import SimilarityIndex
 
 app = Flask(__name__)
 
-@app.route('/entity-extraction', methods=['POST'])
-def entity_extraction():
+# Long-poll requests on GET /jobs/<id> wait at most this many seconds
+MAX_JOB_WAIT = 60
+
+# Near-duplicate mails reuse (or are hinted with) an earlier extraction, SIMILARITY_MAX_ENTRIES=0 disables it
+similarity_index = SimilarityIndex(
+    max_entries=int(os.environ.get('SIMILARITY_MAX_ENTRIES', '2000')),
+    reuse_threshold=float(os.environ.get('SIMILARITY_REUSE_THRESHOLD', '0.95')),
+    hint_threshold=float(os.environ.get('SIMILARITY_HINT_THRESHOLD', '0.6'))
+)
+
+# Extractions slower than SLOW_REQUEST_THRESHOLD seconds are kept for /admin/slow-requests, unset disables it
+slow_requests = SlowRequestLog(
+    threshold=float(os.environ.get('SLOW_REQUEST_THRESHOLD', '0')),
+    size=int(os.environ.get('SLOW_REQUEST_BUFFER', '50'))
+)
+
+# /admin/profile is only served when PROFILING_ENABLED=1, profiles last at most this many seconds
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+MAX_PROFILE_SECONDS = 60
+# The admin endpoints are refused until ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+profiler = SamplingProfiler()
+
+if (PROFILING_ENABLED or slow_requests.enabled) and not ADMIN_TOKEN:
+    print("WARNING: ADMIN_TOKEN is not set, /admin/profile and /admin/slow-requests will answer 403 until it is")
+
+def extract_entities(text, entities, hint=None):
+    """Run one extraction against llama-server and return (body, status_code)."""
     try:
-        # Parse the request JSON
-        data = request.get_json()
-        
-        if not data or 'text' not in data or 'entities' not in data:
-            return jsonify({'error': 'Missing required fields: text and entities'}), 400
-        
-        text = data['text']
-        entities = data['entities']
-        
         # Format the prompt
         prompt = f"You are an entity extraction system. Given the following text: {text}, Extract the following entities: {entities}. Return the results in JSON format."
+        if hint is not None:
+            prompt += f" A very similar email was previously extracted as: {json.dumps(hint, ensure_ascii=False)}. Reuse the values that still apply and correct the ones that changed."
         
         # Prepare the request to llama-server
         llm_payload = {
@@ -27,26 +52,33 @@ def entity_extraction():
             "top_p": 0.9,       # Nucleus sampling
             "prompt": prompt
         }
+        mark_stage('prompt')
         
         # Send request to llama-server
-        llm_response = requests.post(
-            "http://localhost:8080/v1/completions",
-            json=llm_payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=300
-        )
+        try:
+            llm_response = requests.post(
+                "http://localhost:8080/v1/completions",
+                json=llm_payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=300
+            )
+        finally:
+            # Also when the request fails, so the wait is not attributed to a later stage
+            mark_stage('llm')
 
         if llm_response.status_code != 200:
-            return jsonify({
+            return {
                 'error': f'llama.cpp server error: {llm_response.status_code}',
                 'details': llm_response.text
-            }), 500
+            }, 500
         
         # Print llm_response for debug purposes
         print("LLM Response:", llm_response.text)
+        mark_stage('log')
         
         # Extract the JSON content from llama response
         llama_json = llm_response.json()
+        mark_stage('decode')
         
         # Get the text content from the response (assuming it contains the JSON)
         if 'choices' in llama_json and len(llama_json['choices']) > 0:
@@ -58,31 +90,182 @@ def entity_extraction():
                     json_content = json_match.group(0)
                     parsed_json = json.loads(json_content.replace('```json\n', '').replace('\n```', ''))
                     
-                    return jsonify(parsed_json)
+                    return parsed_json, 200
                 else:
                     # If no JSON found, return the raw text with json formatting
-                    return jsonify({
+                    return {
                         'error': 'No JSON found in the response',
-                        'extracted_text': response_text}
-                    )
+                        'extracted_text': response_text}, 200
             except json.JSONDecodeError:
                 # If JSON parsing fails, return the raw text with json formatting
-                return jsonify({
+                return {
                     'error': 'JSON parsing failed',
-                    'extracted_text': response_text}
-                )
+                    'extracted_text': response_text}, 200
         else:
             # Fallback to returning the full response if no choices found
-            return jsonify(llama_json)
+            return llama_json, 200
         
     except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Request to llama-server failed: {str(e)}'}), 500
+        return {'error': f'Request to llama-server failed: {str(e)}'}, 500
     except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return {'error': f'Internal server error: {str(e)}'}, 500
+
+def validate_extraction_request(data):
+    """Return an error response if the request body is not a valid extraction request."""
+    if not data or 'text' not in data or 'entities' not in data:
+        return jsonify({'error': 'Missing required fields: text and entities'}), 400
+    if not isinstance(data['text'], str):
+        return jsonify({'error': 'text must be a string'}), 400
+    return None
+
+def handle_extraction(payload):
+    """Extract entities, reusing the result of a near-duplicate earlier mail when possible."""
+    text = payload['text']
+    entities = payload['entities']
+    use_index = similarity_index.enabled and payload.get('similarity', True)
+
+    hint = None
+    signature = None
+    if use_index:
+        signature = similarity_index.signature(text)
+        action, previous, similarity = similarity_index.lookup(text, entities, signature)
+        mark_stage('similarity_lookup')
+        if action == 'reuse':
+            print(f"Similarity: reusing earlier extraction (similarity {similarity:.2f})")
+            return previous, 200
+        if action == 'hint':
+            hint = previous
+
+    start = time.time()
+    body, status_code = extract_entities(text, entities, hint)
+    mark_stage('parse')
+    if use_index and status_code == 200 and 'error' not in body:
+        similarity_index.add(text, entities, body, elapsed=time.time() - start, signature=signature)
+        mark_stage('similarity_add')
+    return body, status_code
+
+def traced_extraction(payload, source='job'):
+    """handle_extraction(), captured in slow_requests when it exceeds the threshold."""
+    with slow_requests.trace(source, payload) as trace:
+        body, status_code = handle_extraction(payload)
+        trace.status_code = status_code
+    return body, status_code
+
+def check_admin():
+    """Return an error response unless ADMIN_TOKEN is set and the request carries it."""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled, set ADMIN_TOKEN'}), 403
+    if request.headers.get('Authorization') != f'Bearer {ADMIN_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+# Jobs are kept next to this file by default (/app/data in the Docker image), JOBS_DB_PATH overrides it
+job_queue = JobQueue(
+    os.environ.get('JOBS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jobs.sqlite3')),
+    traced_extraction,
+    workers=int(os.environ.get('JOBS_WORKERS', '1')),
+    max_attempts=int(os.environ.get('JOBS_MAX_ATTEMPTS', '3'))
+)
+
+def start_job_workers():
+    # Run as a script, workers start right away. Under flask run or a WSGI server
+    # they start with the first job request, so importing the module has no side effect.
+    # With the debug reloader, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_queue.start()
+
+@app.route('/entity-extraction', methods=['POST'])
+def entity_extraction():
+    # Parse the request JSON
+    data = request.get_json(silent=True)
+
+    error = validate_extraction_request(data)
+    if error:
+        return error
+
+    body, status_code = traced_extraction(data, 'entity-extraction')
+    return jsonify(body), status_code
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    job_queue.start()
+    data = request.get_json(silent=True)
+
+    error = validate_extraction_request(data)
+    if error:
+        return error
+
+    try:
+        priority = resolve_priority(data.get('priority', 'normal'))
+        callback_url = validate_callback_url(data.get('callback_url'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job = job_queue.submit(
+        {'text': data['text'], 'entities': data['entities'], 'similarity': data.get('similarity', True)},
+        priority=priority,
+        callback_url=callback_url
+    )
+    return jsonify(job), 202, {'Location': f"/jobs/{job['id']}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job_queue.start()
+    # ?wait=<seconds> long-polls until the job is finished
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs', methods=['GET'])
+def job_stats():
+    job_queue.start()
+    return jsonify(job_queue.stats())
+
+@app.route('/similarity/stats', methods=['GET'])
+def similarity_stats():
+    return jsonify(similarity_index.stats())
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    # Samples all threads for ?seconds=<n> and returns folded stacks for flamegraph.pl / speedscope
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled, set PROFILING_ENABLED=1'}), 404
+    error = check_admin()
+    if error:
+        return error
+
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), MAX_PROFILE_SECONDS)
+        interval = max(float(request.args.get('interval', 0.005)), 0.001)
+    except ValueError:
+        return jsonify({'error': 'seconds and interval must be numbers'}), 400
+
+    try:
+        folded = profiler.profile(seconds, interval)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return folded, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/admin/slow-requests', methods=['GET'])
+def admin_slow_requests():
+    if not slow_requests.enabled:
+        return jsonify({'error': 'Slow request capture is disabled, set SLOW_REQUEST_THRESHOLD'}), 404
+    error = check_admin()
+    if error:
+        return error
+    return jsonify(slow_requests.entries())
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'})
 
 if __name__ == '__main__':
+    app.debug = True
+    start_job_workers()
     app.run(host='0.0.0.0', port=8081, debug=True)
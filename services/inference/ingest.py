@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Bulk mailbox ingestion: stream an mbox file or a Maildir through the entity
+extraction service and append the results to a JSONL file.
+
+    python3 ingest.py ~/mail/bookings.mbox --entities schema.json --output bookings.jsonl
+
+Messages are read one at a time, so the mailbox never has to fit in memory.
+Text bodies are extracted from the MIME structure (text/plain preferred,
+text/html stripped otherwise) and sent to the service with a bounded number
+of requests in flight. Each result is written as soon as it arrives, then its
+message is recorded in a checkpoint file: re-running the same command skips
+what was already processed and retries what failed.
+"""
+
+import argparse
+import email
+import hashlib
+import html
+import json
+import mailbox
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email import policy
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from client import EntityExtractionClient, EntityExtractionError
+
+_TAG = re.compile(r'<(script|style)\b.*?</\1>|<[^>]+>', re.DOTALL | re.IGNORECASE)
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+# mboxrd escapes body lines starting with "From " (or already escaped ones) with one more '>'
+_ESCAPED_FROM = re.compile(rb'^>+From ')
+
+
+def iter_mbox(path: str) -> Iterator[bytes]:
+    """Yield the raw bytes of each message of an mbox file, one at a time, unescaping >From lines."""
+    with open(path, 'rb') as mbox:
+        lines = None
+        for line in mbox:
+            if line.startswith(b'From '):
+                if lines:
+                    yield b''.join(lines)
+                lines = []
+            elif lines is not None:
+                lines.append(line[1:] if _ESCAPED_FROM.match(line) else line)
+        if lines:
+            yield b''.join(lines)
+
+
+def iter_maildir(path: str) -> Iterator[bytes]:
+    """Yield the raw bytes of each message of a Maildir, one file at a time."""
+    maildir = mailbox.Maildir(path, factory=None, create=False)
+    for key in maildir.iterkeys():
+        try:
+            yield maildir.get_bytes(key)
+        except KeyError:
+            # Moved or deleted by another client since the directory was listed
+            continue
+
+
+def iter_messages(path: str, mailbox_format: str = 'auto') -> Iterator[bytes]:
+    if mailbox_format == 'auto':
+        mailbox_format = 'maildir' if os.path.isdir(path) else 'mbox'
+    return iter_maildir(path) if mailbox_format == 'maildir' else iter_mbox(path)
+
+
+def message_text(message: email.message.EmailMessage) -> str:
+    """Return the text body of a message, preferring text/plain over text/html."""
+    part = message.get_body(preferencelist=('plain', 'html'))
+    if part is None:
+        return ''
+    try:
+        content = part.get_content()
+    except (LookupError, UnicodeDecodeError):
+        payload = part.get_payload(decode=True) or b''
+        content = payload.decode('utf-8', errors='replace')
+    if part.get_content_subtype() == 'html':
+        content = html.unescape(_TAG.sub(' ', content))
+    return _BLANK_LINES.sub('\n\n', content).strip()
+
+
+def parse_message(raw: bytes) -> Tuple[str, Dict[str, Any], str]:
+    """Parse a raw message into (checkpoint key, metadata, text to extract from)."""
+    message = email.message_from_bytes(raw, policy=policy.default)
+    message_id = str(message.get('Message-ID', '')).strip()
+    key = message_id or hashlib.sha1(raw).hexdigest()
+    metadata = {
+        'message_id': message_id or None,
+        'subject': str(message.get('Subject', '')),
+        'from': str(message.get('From', '')),
+        'date': str(message.get('Date', '')),
+    }
+    body = message_text(message)
+    text = f"Subject: {metadata['subject']}\nFrom: {metadata['from']}\n\n{body}" if body else ''
+    return key, metadata, text
+
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as checkpoint:
+        return {line.rstrip('\n') for line in checkpoint if line.strip()}
+
+
+class ProgressReporter:
+    """Periodically print throughput in messages per minute to stderr."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_processed = 0
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def tick(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        elapsed = max(now - self.started, 1e-9)
+        recent = (self.processed - self.last_processed) / max(now - self.last_report, 1e-9)
+        print(
+            f"[{elapsed:.0f}s] processed: {self.processed}, skipped: {self.skipped}, failed: {self.failed} | "
+            f"{self.processed / elapsed * 60:.1f} msg/min overall, {recent * 60:.1f} msg/min recent",
+            file=sys.stderr
+        )
+        self.last_report = now
+        self.last_processed = self.processed
+
+
+def ingest(source: str, entity_types: Dict[str, Any], output: str, checkpoint: str,
+           client: EntityExtractionClient, concurrency: int = 4, mailbox_format: str = 'auto',
+           priority: Any = 'bulk', report_interval: float = 30) -> ProgressReporter:
+    done = load_checkpoint(checkpoint)
+    reporter = ProgressReporter(report_interval)
+
+    def extract(text):
+        return client.extract(text, entity_types, priority=priority)
+
+    with open(output, 'a', encoding='utf-8') as results, \
+            open(checkpoint, 'a', encoding='utf-8') as checkpoint_file, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                key, metadata = pending.pop(future)
+                try:
+                    result = future.result()
+                except EntityExtractionError as e:
+                    reporter.failed += 1
+                    print(f"Failed to extract {key}: {e}", file=sys.stderr)
+                    continue
+                # The service answers 200 with an 'error' key when the model output is not JSON
+                if isinstance(result, dict) and 'error' in result:
+                    reporter.failed += 1
+                    print(f"Failed to extract {key}: {result['error']}", file=sys.stderr)
+                    continue
+                results.write(json.dumps({**metadata, 'result': result}, ensure_ascii=False) + '\n')
+                results.flush()
+                # Checkpoint only once the result is safely written
+                checkpoint_file.write(key + '\n')
+                checkpoint_file.flush()
+                reporter.processed += 1
+
+        for raw in iter_messages(source, mailbox_format):
+            try:
+                key, metadata, text = parse_message(raw)
+            except Exception as e:
+                reporter.failed += 1
+                print(f"Failed to parse a message: {e}", file=sys.stderr)
+                continue
+            if key in done or not text:
+                reporter.skipped += 1
+                continue
+            done.add(key)
+
+            # Keep a bounded number of messages in flight
+            while len(pending) >= concurrency:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+                reporter.tick()
+            pending[executor.submit(extract, text)] = (key, metadata)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+            reporter.tick()
+
+    reporter.tick(force=True)
+    return reporter
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description='Extract entities from every message of an mbox file or Maildir.')
+    parser.add_argument('source', help='mbox file or Maildir directory')
+    parser.add_argument('--entities', required=True, help='JSON file with the entities to extract')
+    parser.add_argument('--output', required=True, help='JSONL file results are appended to')
+    parser.add_argument('--checkpoint', help='file recording processed messages (default: <output>.checkpoint)')
+    parser.add_argument('--url', default='http://localhost:8081', help='entity extraction service URL')
+    parser.add_argument('--format', choices=('auto', 'mbox', 'maildir'), default='auto', help='mailbox format')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight')
+    parser.add_argument('--priority', default='bulk', help='job priority when the job API is available')
+    parser.add_argument('--report-interval', type=float, default=30, help='seconds between throughput reports')
+    args = parser.parse_args(argv)
+
+    with open(args.entities, encoding='utf-8') as entities_file:
+        entity_types = json.load(entities_file)
+
+    with EntityExtractionClient(args.url, pool_size=args.concurrency) as client:
+        # Jobs survive dropped connections, use them when the server has them
+        try:
+            client.use_jobs = client.jobs_supported()
+        except EntityExtractionError as e:
+            print(f"Cannot reach the entity extraction service at {args.url}: {e}", file=sys.stderr)
+            return 2
+        reporter = ingest(
+            args.source, entity_types, args.output, args.checkpoint or f'{args.output}.checkpoint',
+            client, concurrency=args.concurrency, mailbox_format=args.format,
+            priority=args.priority, report_interval=args.report_interval
+        )
+
+    return 1 if reporter.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
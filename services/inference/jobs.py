@@ -0,0 +1,265 @@
+"""
+Durable job queue for long-running entity extractions.
+
+Jobs are stored in a local SQLite database, so queued and in-flight work
+survives a restart of the container: on start-up, jobs that were left
+'running' are put back in the queue. A small pool of worker threads pulls
+jobs by priority (highest first, then oldest first) and hands their payload
+to a handler returning (body, status_code), like extract_entities().
+A job interrupted max_attempts times (e.g. because it crashes the process)
+is marked 'failed' instead of being queued again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+
+# Named priorities accepted by the API, higher runs first
+PRIORITIES = {
+    'interactive': 10,
+    'normal': 0,
+    'bulk': -10,
+}
+
+# Integer priorities are clamped to this range so they fit in a SQLite INTEGER
+MIN_PRIORITY = -1000
+MAX_PRIORITY = 1000
+
+TERMINAL_STATUSES = ('done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    callback_url TEXT,
+    result TEXT,
+    status_code INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+"""
+
+
+def resolve_priority(value):
+    """Turn a priority name or integer into an integer priority."""
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid priority: {value}')
+    if isinstance(value, str):
+        if value in PRIORITIES:
+            return PRIORITIES[value]
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    if isinstance(value, int):
+        return min(max(value, MIN_PRIORITY), MAX_PRIORITY)
+    raise ValueError(f'Invalid priority: {value} (use an integer or one of {", ".join(PRIORITIES)})')
+
+
+def validate_callback_url(value):
+    """Return a webhook URL if it is an absolute http(s) URL, raise ValueError otherwise."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        parsed = urlparse(value)
+        if parsed.scheme in ('http', 'https') and parsed.netloc:
+            return value
+    raise ValueError(f'Invalid callback_url: {value} (use an absolute http or https URL)')
+
+
+class JobQueue:
+    """SQLite-backed priority queue processed by a pool of worker threads."""
+
+    def __init__(self, db_path, handler, workers=1, poll_interval=1.0, retention=7 * 24 * 3600, max_attempts=3):
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._work_available = threading.Condition()
+        self._job_finished = threading.Condition()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _connection(self):
+        """Return the calling thread's connection, opening it (and creating the schema) on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def start(self):
+        """Recover interrupted jobs and start the workers. Does nothing if already started."""
+        with self._start_lock:
+            if not self._threads:
+                self._start()
+
+    def _start(self):
+        connection = self._connection()
+
+        # Jobs still 'running' were interrupted by a restart: give up on those
+        # that already used all their attempts, queue the others again
+        abandoned = connection.execute(
+            "UPDATE jobs SET status = 'failed', result = ?, status_code = 500, finished_at = ? "
+            "WHERE status = 'running' AND attempts >= ?",
+            (json.dumps({'error': f'Job interrupted {self.max_attempts} times, giving up'}), time.time(), self.max_attempts)
+        ).rowcount
+        if abandoned:
+            print(f"Jobs: marked {abandoned} job(s) failed after {self.max_attempts} interrupted attempts")
+
+        recovered = connection.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+        ).rowcount
+        if recovered:
+            print(f"Jobs: re-queued {recovered} interrupted job(s)")
+
+        if self.retention:
+            connection.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?',
+                (*TERMINAL_STATUSES, time.time() - self.retention)
+            )
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Ask the workers to exit once their current job is finished."""
+        self._stopping.set()
+        with self._work_available:
+            self._work_available.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, payload, priority=0, callback_url=None):
+        """Persist a new job and wake up a worker. Returns the job."""
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO jobs (id, status, priority, payload, callback_url, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', priority, json.dumps(payload), callback_url, time.time())
+        )
+        with self._work_available:
+            self._work_available.notify()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return the public view of a job, or None if it does not exist."""
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def wait(self, job_id, timeout):
+        """Long-poll a job until it is finished or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job and job['status'] not in TERMINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._job_finished:
+                self._job_finished.wait(min(remaining, self.poll_interval))
+            job = self.get(job_id)
+        return job
+
+    def stats(self):
+        """Return the number of jobs per status."""
+        rows = self._connection().execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+    def _claim(self):
+        """Atomically move the next queued job to 'running' and return it."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (time.time(), row['id'])
+                )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"Jobs: failed to claim a job: {e}")
+                row = None
+
+            if row is None:
+                with self._work_available:
+                    self._work_available.wait(self.poll_interval)
+                continue
+
+            try:
+                self._run(row)
+            except sqlite3.Error as e:
+                # The job stays 'running' and is queued again on the next start
+                print(f"Jobs: failed to store the result of job {row['id']}: {e}")
+
+    def _run(self, row):
+        try:
+            body, status_code = self.handler(json.loads(row['payload']))
+        except Exception as e:
+            body, status_code = {'error': f'Internal server error: {str(e)}'}, 500
+
+        status = 'done' if status_code == 200 else 'failed'
+        self._connection().execute(
+            'UPDATE jobs SET status = ?, result = ?, status_code = ?, finished_at = ? WHERE id = ?',
+            (status, json.dumps(body), status_code, time.time(), row['id'])
+        )
+        with self._job_finished:
+            self._job_finished.notify_all()
+
+        if row['callback_url']:
+            self._notify_callback(row['callback_url'], self.get(row['id']))
+
+    def _notify_callback(self, url, job):
+        """POST the finished job to its webhook. Delivery is best effort."""
+        try:
+            requests.post(url, json=job, timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"Jobs: webhook {url} failed for job {job['id']}: {e}")
+
+    @staticmethod
+    def _to_dict(row):
+        job = {
+            'id': row['id'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'attempts': row['attempts'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+        if row['status'] in TERMINAL_STATUSES:
+            job['status_code'] = row['status_code']
+            job['result'] = json.loads(row['result'])
+        return job
@@ -0,0 +1,169 @@
+"""
+On-demand profiling and slow request capture for the Python front end.
+
+SamplingProfiler samples the stacks of every thread of the process for a
+bounded duration and returns them in the folded format understood by
+flamegraph.pl and speedscope ("frame;frame;frame count" per line).
+
+SlowRequestLog times each extraction. Code on the request path calls
+mark_stage(name) when a stage finishes; requests slower than the threshold
+are kept, with their stage timings and the shape of their payload (sizes
+and entity keys, never the mail itself), in a bounded ring buffer. When
+disabled, tracing and marks are no-ops.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+_current = threading.local()
+
+
+def payload_shape(payload):
+    """Describe an extraction payload without its content: sizes and entity keys."""
+    text = payload.get('text', '')
+    entities = payload.get('entities')
+    return {
+        'text_chars': len(text),
+        'text_lines': text.count('\n') + 1 if text else 0,
+        'entity_keys': sorted(entities) if isinstance(entities, dict) else None,
+        'similarity': payload.get('similarity', True),
+    }
+
+
+def mark_stage(name):
+    """Record that a stage of the current request just finished."""
+    trace = getattr(_current, 'trace', None)
+    if trace is not None:
+        trace.mark(name)
+
+
+class RequestTrace:
+    def __init__(self, source, payload):
+        self.source = source
+        self.payload = payload
+        self.started = time.perf_counter()
+        self.last_mark = self.started
+        self.stages = []
+        self.status_code = None
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self.last_mark))
+        self.last_mark = now
+
+
+class _NoTrace:
+    """Stand-in returned when slow request capture is disabled."""
+
+    status_code = None
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_TRACE = _NoTrace()
+
+
+class _ActiveTrace:
+    def __init__(self, log, trace):
+        self.log = log
+        self.trace = trace
+
+    def __enter__(self):
+        _current.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        _current.trace = None
+        self.log.finish(self.trace)
+        return False
+
+
+class SlowRequestLog:
+    """Ring buffer of requests slower than a threshold (in seconds, 0 disables)."""
+
+    def __init__(self, threshold=0.0, size=50):
+        self.threshold = threshold
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def trace(self, source, payload):
+        """Context manager timing one request; set .status_code on the result."""
+        if not self.enabled:
+            return _NO_TRACE
+        return _ActiveTrace(self, RequestTrace(source, payload))
+
+    def finish(self, trace):
+        now = time.perf_counter()
+        elapsed = now - trace.started
+        if elapsed < self.threshold:
+            return
+        if now - trace.last_mark > 0:
+            trace.mark('other')
+
+        entry = {
+            'time': time.time(),
+            'source': trace.source,
+            'elapsed_s': round(elapsed, 4),
+            'status_code': trace.status_code,
+            'stages': {name: round(duration, 4) for name, duration in trace.stages},
+            'payload': payload_shape(trace.payload),
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        """Captured requests, most recent first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+
+class SamplingProfiler:
+    """Time-bounded statistical profiler over all threads of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds, interval=0.005):
+        """
+        Sample every thread for `seconds` and return folded stacks.
+        Raises RuntimeError if another profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError('A profile is already running')
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds, interval):
+        me = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    # One frame per function, not per line, so a function is a single tower
+                    frames.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                frames.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(frames))] += 1
+            time.sleep(interval)
+        return '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common()) + '\n'
@@ -0,0 +1,233 @@
+"""
+Near-duplicate email index used to reuse earlier extractions.
+
+Booking mails are often re-sent with a different greeting, or come back with
+one more reply quoted above the original. Each mail is normalized into word
+shingles and summarized by a MinHash signature; locality-sensitive hashing
+(banding) finds earlier mails extracted with the same entities schema whose
+estimated Jaccard similarity is high enough to either reuse their result
+outright or pass it to the model as a hint.
+
+A high score alone does not tell a new greeting from a new date, so a result
+is only reused if the literal values it took from the earlier mail (names,
+phones, URLs...) still appear in the new one and both mails contain the same
+numbers (dates, times, amounts, headcounts), which catches values the model
+reformatted; otherwise the match is downgraded to a hint.
+
+The index lives in memory, is bounded to a number of entries (least recently
+used entries are evicted first) and is updated incrementally after each
+successful extraction.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+# Mersenne prime used by the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_QUOTED_LINE = re.compile(r'^\s*>.*$', re.MULTILINE)
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Lowercase the mail, drop quoted reply lines and punctuation."""
+    text = _QUOTED_LINE.sub(' ', text)
+    return _NON_WORD.sub(' ', text.lower()).split()
+
+
+def shingles(tokens, size):
+    """Return the set of hashed word n-grams of a token list."""
+    if len(tokens) < size:
+        return {zlib.crc32(' '.join(tokens).encode())} if tokens else set()
+    return {
+        zlib.crc32(' '.join(tokens[i:i + size]).encode())
+        for i in range(len(tokens) - size + 1)
+    }
+
+
+def literal_values(result, tokens):
+    """
+    Normalized string values of a result that appear word for word in a mail.
+    Values the model inferred rather than copied (a category, a reformatted
+    date) are left out as they cannot be checked against another mail.
+    """
+    text = f" {' '.join(tokens)} "
+    values = set()
+    stack = [result]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            normalized = ' '.join(normalize(str(value)))
+            if normalized and f' {normalized} ' in text:
+                values.add(normalized)
+    return frozenset(values)
+
+
+def numbers(tokens):
+    """Set of the tokens containing a digit: days, years, times, prices, headcounts..."""
+    return frozenset(token for token in tokens if any(char.isdigit() for char in token))
+
+
+def schema_key(entities):
+    """Key identifying an entities schema, independent of key order."""
+    return hashlib.sha1(json.dumps(entities, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class SimilarityIndex:
+    """Bounded MinHash/LSH index of previous extractions, one namespace per schema."""
+
+    def __init__(self, max_entries=2000, num_perm=128, bands=32, shingle_size=3,
+                 reuse_threshold=0.95, hint_threshold=0.6):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.reuse_threshold = reuse_threshold
+        self.hint_threshold = hint_threshold
+
+        generator = random.Random(1)
+        self._permutations = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'lookups': 0,
+            'reused': 0,
+            'hinted': 0,
+            'misses': 0,
+            'downgraded': 0,
+            'added': 0,
+            'evicted': 0,
+            'inference_seconds_avoided': 0.0,
+        }
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def signature(self, text):
+        """MinHash signature of a mail, or None if it has no words."""
+        hashed = shingles(normalize(text), self.shingle_size)
+        if not hashed:
+            return None
+        return array('Q', (
+            min((a * value + b) % _PRIME for value in hashed) & _MAX_HASH
+            for a, b in self._permutations
+        ))
+
+    def _band_keys(self, schema, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (schema, band, tuple(signature[start:start + self.rows]))
+
+    def _similarity(self, left, right):
+        return sum(1 for a, b in zip(left, right) if a == b) / self.num_perm
+
+    def lookup(self, text, entities, signature=None):
+        """
+        Find the most similar earlier mail extracted with the same schema.
+
+        Returns (action, result, similarity) where action is 'reuse' when the
+        earlier result can be returned as is, 'hint' when it should be given
+        to the model, or None. Pass the signature if it is already computed.
+        """
+        if signature is None:
+            signature = self.signature(text)
+        schema = schema_key(entities)
+        tokens = normalize(text)
+        words = f" {' '.join(tokens)} "
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            best_id, best_similarity = None, 0.0
+            if signature is not None:
+                candidates = set()
+                for key in self._band_keys(schema, signature):
+                    candidates.update(self._buckets.get(key, ()))
+                for entry_id in candidates:
+                    similarity = self._similarity(signature, self._entries[entry_id]['signature'])
+                    if similarity > best_similarity:
+                        best_id, best_similarity = entry_id, similarity
+
+            if best_id is not None and best_similarity >= self.hint_threshold:
+                self._entries.move_to_end(best_id)
+                entry = self._entries[best_id]
+                if best_similarity >= self.reuse_threshold:
+                    unchanged = entry['numbers'] == numbers(tokens) and all(
+                        f' {value} ' in words for value in entry['literals']
+                    )
+                    if unchanged:
+                        self._stats['reused'] += 1
+                        self._stats['inference_seconds_avoided'] += entry['elapsed']
+                        return 'reuse', entry['result'], best_similarity
+                    self._stats['downgraded'] += 1
+                self._stats['hinted'] += 1
+                return 'hint', entry['result'], best_similarity
+
+            self._stats['misses'] += 1
+            return None, None, best_similarity
+
+    def add(self, text, entities, result, elapsed=0.0, signature=None):
+        """Index a successful extraction, evicting the least recently used entries."""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return
+        schema = schema_key(entities)
+        tokens = normalize(text)
+        literals = literal_values(result, tokens)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                'schema': schema,
+                'signature': signature,
+                'result': result,
+                'literals': literals,
+                'numbers': numbers(tokens),
+                'elapsed': elapsed,
+            }
+            for key in self._band_keys(schema, signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self._stats['added'] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        entry_id, entry = self._entries.popitem(last=False)
+        for key in self._band_keys(entry['schema'], entry['signature']):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+        self._stats['evicted'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            stats['reuse_threshold'] = self.reuse_threshold
+            stats['hint_threshold'] = self.hint_threshold
+            return stats
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the retry and backoff logic of the extraction client.
+Run with: python3 -m unittest test_client
+"""
+
+import email.utils
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from client import EntityExtractionClient, EntityExtractionError, _never_sent
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each request with the next (delay, status, headers) of the server's script."""
+
+    def do_GET(self):
+        self.answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.answer()
+
+    def answer(self):
+        self.server.requests.append((self.command, self.path))
+        delay, status, headers = self.server.script.pop(0) if self.server.script else (0, 200, {})
+        time.sleep(delay)
+        body = json.dumps({"status": status}).encode()
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+        self.server.daemon_threads = True
+        self.server.script = []
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = self.make_client(f"http://127.0.0.1:{self.server.server_port}")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def make_client(url, **kwargs):
+        return EntityExtractionClient(url, max_retries=2, backoff=0.01, max_backoff=0.01, **kwargs)
+
+    def test_retries_a_refused_connection(self):
+        client = self.make_client(f"http://127.0.0.1:{free_port()}")
+        attempts = []
+        send = client.session.request
+
+        def counting_request(*args, **kwargs):
+            attempts.append(args)
+            return send(*args, **kwargs)
+
+        client.session.request = counting_request
+        with self.assertRaises(EntityExtractionError):
+            client.extract("text", {})
+        client.close()
+        self.assertEqual(len(attempts), 3)
+
+    def test_does_not_retry_a_post_that_timed_out(self):
+        self.server.script = [(1, 200, {})]
+        client = self.make_client(self.client.base_url, timeout=0.2)
+        with self.assertRaises(EntityExtractionError):
+            client.extract("text", {})
+        client.close()
+        self.assertEqual(self.server.requests, [("POST", "/entity-extraction")])
+
+    def test_retries_a_get_that_timed_out(self):
+        self.server.script = [(1, 200, {}), (0, 200, {})]
+        client = self.make_client(self.client.base_url, timeout=0.2)
+        client.get_job("job")
+        client.close()
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_retries_a_post_answered_503(self):
+        self.server.script = [(0, 503, {"Retry-After": "0"}), (0, 200, {})]
+        self.assertEqual(self.client.extract("text", {}), {"status": 200})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_does_not_retry_a_500(self):
+        self.server.script = [(0, 500, {})]
+        with self.assertRaises(EntityExtractionError) as raised:
+            self.client.extract("text", {})
+        self.assertEqual(raised.exception.status_code, 500)
+        self.assertEqual(raised.exception.body, {"status": 500})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_does_not_retry_a_post_answered_502(self):
+        self.server.script = [(0, 502, {})]
+        with self.assertRaises(EntityExtractionError):
+            self.client.extract("text", {})
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class RetryDelayTest(unittest.TestCase):
+    def setUp(self):
+        self.client = EntityExtractionClient(backoff=0.01, max_backoff=0.01)
+
+    def tearDown(self):
+        self.client.close()
+
+    @staticmethod
+    def response(retry_after):
+        response = requests.Response()
+        response.headers["Retry-After"] = retry_after
+        return response
+
+    def test_honours_retry_after_in_seconds(self):
+        self.assertEqual(self.client._retry_delay(0, self.response("7")), 7)
+
+    def test_honours_retry_after_as_an_http_date(self):
+        retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(self.client._retry_delay(0, self.response(retry_at)), 30, delta=2)
+
+    def test_ignores_an_invalid_retry_after(self):
+        self.assertLessEqual(self.client._retry_delay(0, self.response("soon")), 0.01)
+
+    def test_backoff_is_capped(self):
+        self.assertLessEqual(self.client._retry_delay(10, None), 0.01)
+
+
+class NeverSentTest(unittest.TestCase):
+    def test_refused_connection_was_never_sent(self):
+        with self.assertRaises(requests.exceptions.ConnectionError) as raised:
+            requests.post(f"http://127.0.0.1:{free_port()}/", timeout=2)
+        self.assertTrue(_never_sent(raised.exception))
+
+    def test_connect_timeout_was_never_sent(self):
+        self.assertTrue(_never_sent(requests.exceptions.ConnectTimeout()))
+
+    def test_read_timeout_may_have_been_processed(self):
+        self.assertFalse(_never_sent(requests.exceptions.ReadTimeout()))
+        self.assertFalse(_never_sent(requests.exceptions.ConnectionError("Connection reset by peer")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Unit tests for mailbox ingestion.
+Run with: python3 -m unittest test_ingest
+"""
+
+import email
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from email import policy
+
+from client import EntityExtractionError
+from ingest import ingest, iter_mbox, message_text
+
+MBOX = b"""From laurie@example.com Mon Jan  6 10:00:00 2025
+Message-ID: <plain@example.com>
+Subject: Nuit de la lecture
+From: Laurie Cartier <laurie@example.com>
+Content-Type: text/plain; charset=utf-8
+
+Bonjour,
+>From the library of Pinsaguel, a quote request.
+>>From an escaped line.
+
+From marie@example.com Tue Jan  7 10:00:00 2025
+Message-ID: <html@example.com>
+Subject: Spectacle
+From: Marie Paris <marie@example.com>
+MIME-Version: 1.0
+Content-Type: multipart/alternative; boundary="b"
+
+--b
+Content-Type: text/html; charset=utf-8
+Content-Transfer-Encoding: quoted-printable
+
+<html><style>p {color: red}</style><p>M=C3=A9diath=C3=A8que &amp; contes</p></html>
+--b--
+
+From john@example.com Wed Jan  8 10:00:00 2025
+Message-ID: <invoice@example.com>
+Subject: Invoice
+From: John <john@example.com>
+Content-Type: text/plain; charset=utf-8
+Content-Transfer-Encoding: base64
+
+SGVsbG8gSm9obiwgdGhlIGludm9pY2UgaXMgZHVlIG9uIEZyaWRheS4=
+"""
+
+
+class FakeClient:
+    """Stands in for EntityExtractionClient. `failing` maps subjects to "raise" or "error"."""
+
+    def __init__(self, failing=None):
+        self.failing = failing or {}
+        self.texts = []
+
+    def extract(self, text, entity_types, priority=None):
+        self.texts.append(text)
+        subject = text.splitlines()[0][len("Subject: "):]
+        if subject in self.failing:
+            if self.failing[subject] == "raise":
+                raise EntityExtractionError("POST /entity-extraction returned 500", status_code=500)
+            return {"error": "JSON parsing failed"}
+        return {"subject": subject}
+
+
+class TempMboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mbox = os.path.join(self.directory, "mail.mbox")
+        with open(self.mbox, "wb") as mbox:
+            mbox.write(MBOX)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+class MboxTest(TempMboxTestCase):
+    def messages(self):
+        return [email.message_from_bytes(raw, policy=policy.default) for raw in iter_mbox(self.mbox)]
+
+    def test_splits_messages_and_unescapes_from_lines(self):
+        messages = self.messages()
+        self.assertEqual([str(message["Subject"]) for message in messages], ["Nuit de la lecture", "Spectacle", "Invoice"])
+        self.assertIn("\nFrom the library of Pinsaguel", message_text(messages[0]))
+        self.assertIn("\n>From an escaped line.", message_text(messages[0]))
+
+    def test_falls_back_to_stripped_html(self):
+        self.assertEqual(message_text(self.messages()[1]), "Médiathèque & contes")
+
+    def test_decodes_transfer_encodings(self):
+        self.assertEqual(message_text(self.messages()[2]), "Hello John, the invoice is due on Friday.")
+
+
+class IngestTest(TempMboxTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = os.path.join(self.directory, "results.jsonl")
+        self.checkpoint = self.output + ".checkpoint"
+
+    def run_ingest(self, client):
+        return ingest(self.mbox, {"subject": ""}, self.output, self.checkpoint, client, concurrency=2, report_interval=3600)
+
+    def results(self):
+        with open(self.output, encoding="utf-8") as output:
+            return [json.loads(line) for line in output]
+
+    def test_resumed_run_skips_written_messages_and_retries_failed_ones(self):
+        first = FakeClient(failing={"Spectacle": "error", "Invoice": "raise"})
+        reporter = self.run_ingest(first)
+        self.assertEqual((reporter.processed, reporter.failed), (1, 2))
+        self.assertEqual([result["message_id"] for result in self.results()], ["<plain@example.com>"])
+
+        second = FakeClient()
+        reporter = self.run_ingest(second)
+        self.assertEqual((reporter.processed, reporter.skipped, reporter.failed), (2, 1, 0))
+        self.assertEqual(sorted(text.splitlines()[0] for text in second.texts), ["Subject: Invoice", "Subject: Spectacle"])
+        self.assertEqual(
+            sorted(result["result"]["subject"] for result in self.results()),
+            ["Invoice", "Nuit de la lecture", "Spectacle"]
+        )
+
+        third = FakeClient()
+        self.assertEqual(self.run_ingest(third).skipped, 3)
+        self.assertEqual(third.texts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
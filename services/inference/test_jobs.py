@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the durable job queue.
+Run with: python3 -m unittest test_jobs
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from jobs import MAX_PRIORITY, JobQueue, resolve_priority, validate_callback_url
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "jobs.sqlite3")
+        self.handled = []
+        self.release = threading.Event()
+        self.release.set()
+        self.queue = self.make_queue()
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.stop(timeout=5)
+        shutil.rmtree(self.directory)
+
+    def make_queue(self, **kwargs):
+        return JobQueue(self.db_path, self.handle, poll_interval=0.05, **kwargs)
+
+    def handle(self, payload):
+        self.release.wait(5)
+        self.handled.append(payload["text"])
+        return {"text": payload["text"]}, 200
+
+    @staticmethod
+    def set_running(queue, job_id, attempts):
+        # As left by a process that died while running the job
+        queue._connection().execute(
+            "UPDATE jobs SET status = 'running', attempts = ? WHERE id = ?", (attempts, job_id)
+        )
+
+    def test_runs_interactive_jobs_before_bulk_jobs(self):
+        bulk = self.queue.submit({"text": "bulk"}, priority=resolve_priority("bulk"))
+        self.queue.submit({"text": "normal"}, priority=resolve_priority("normal"))
+        self.queue.submit({"text": "interactive"}, priority=resolve_priority("interactive"))
+        self.queue.start()
+
+        # Submitted first but run last
+        self.assertEqual(self.queue.wait(bulk["id"], 5)["status"], "done")
+        self.assertEqual(self.handled, ["interactive", "normal", "bulk"])
+
+    def test_requeues_interrupted_jobs_on_start(self):
+        job = self.queue.submit({"text": "interrupted"})
+        self.set_running(self.queue, job["id"], attempts=1)
+
+        self.queue.start()
+        job = self.queue.wait(job["id"], 5)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["attempts"], 2)
+        self.assertEqual(job["result"], {"text": "interrupted"})
+
+    def test_gives_up_after_max_attempts(self):
+        queue = self.make_queue(max_attempts=2)
+        job = queue.submit({"text": "crashes the process"})
+        self.set_running(queue, job["id"], attempts=2)
+
+        queue.start()
+        job = queue.get(job["id"])
+        queue.stop(timeout=5)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["status_code"], 500)
+        self.assertIn("interrupted 2 times", job["result"]["error"])
+        self.assertEqual(self.handled, [])
+
+    def test_wait_returns_the_unfinished_job_after_the_timeout(self):
+        self.release.clear()
+        job = self.queue.submit({"text": "slow"})
+        self.queue.start()
+
+        started = time.monotonic()
+        job = self.queue.wait(job["id"], 0.3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertIn(job["status"], ("queued", "running"))
+        self.assertNotIn("result", job)
+
+    def test_wait_returns_none_for_an_unknown_job(self):
+        self.assertIsNone(self.queue.wait("unknown", 0.1))
+
+
+class ValidationTest(unittest.TestCase):
+    def test_resolves_names_and_clamps_integers(self):
+        self.assertEqual(resolve_priority("interactive"), 10)
+        self.assertEqual(resolve_priority("5"), 5)
+        self.assertEqual(resolve_priority("99999999999999999999999"), MAX_PRIORITY)
+
+    def test_rejects_invalid_priorities(self):
+        for value in ("urgent", True, 1.5, None):
+            with self.assertRaises(ValueError):
+                resolve_priority(value)
+
+    def test_accepts_only_absolute_http_callback_urls(self):
+        self.assertEqual(validate_callback_url("https://example.com/hook"), "https://example.com/hook")
+        self.assertIsNone(validate_callback_url(None))
+        for value in (123, "/hook", "ftp://example.com/hook", "example.com/hook"):
+            with self.assertRaises(ValueError):
+                validate_callback_url(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
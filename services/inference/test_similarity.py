@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the near-duplicate email index.
+Run with: python3 -m unittest test_similarity
+"""
+
+import json
+import os
+import unittest
+
+from similarity import SimilarityIndex, literal_values, normalize, numbers
+
+ENTITIES = {
+    "sender": {"name": ""},
+    "organization": {"organization_name": "", "website": "", "phone_number": "", "city": ""},
+}
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures.json"), encoding="utf-8") as fixtures:
+    EMAIL = next(case["text"] for case in json.load(fixtures) if case["name"] == "pinsaguel")
+
+RESULT = {
+    "sender": {"name": "Laurie Cartier"},
+    "organization": {
+        "organization_name": "MEDIATHEQUE SALOU CASAÏS",
+        "website": "http://mediatheque.mairie-pinsaguel.com/",
+        "phone_number": "05.61.76.88.68",
+        "city": "Pinsaguel",
+        "type": "Médiathèque municipale",
+    },
+}
+
+
+class LiteralValuesTest(unittest.TestCase):
+    def test_keeps_values_copied_from_the_mail(self):
+        literals = literal_values(RESULT, normalize(EMAIL))
+        self.assertIn("laurie cartier", literals)
+        self.assertIn("05 61 76 88 68", literals)
+        self.assertIn("http mediatheque mairie pinsaguel com", literals)
+
+    def test_ignores_inferred_values(self):
+        self.assertNotIn("médiathèque municipale", literal_values(RESULT, normalize(EMAIL)))
+
+
+class NumbersTest(unittest.TestCase):
+    def test_keeps_dates_times_and_amounts(self):
+        self.assertEqual(
+            numbers(normalize("Le 24/01/2025 de 18h à 22h pour 25 personnes, 500€")),
+            {"24", "01", "2025", "18h", "22h", "25", "500"}
+        )
+
+
+class SimilarityIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SimilarityIndex(max_entries=10)
+        self.index.add(EMAIL, ENTITIES, RESULT, elapsed=12.0)
+
+    def test_reuses_result_when_only_the_greeting_changed(self):
+        action, result, similarity = self.index.lookup(EMAIL.replace("Bonjour", "Bonsoir"), ENTITIES)
+        self.assertEqual(action, "reuse")
+        self.assertIs(result, RESULT)
+        self.assertGreaterEqual(similarity, self.index.reuse_threshold)
+        self.assertEqual(self.index.stats()["inference_seconds_avoided"], 12.0)
+
+    def test_reuses_result_with_a_quoted_reply(self):
+        quoted = "\n".join(f"> {line}" for line in "Merci pour votre retour rapide".split())
+        action, _, _ = self.index.lookup(quoted + EMAIL, ENTITIES)
+        self.assertEqual(action, "reuse")
+
+    def test_downgrades_to_hint_when_a_copied_value_changed(self):
+        # Low threshold so the MinHash estimate alone would allow a reuse
+        index = SimilarityIndex(max_entries=10, reuse_threshold=0.8)
+        index.add(EMAIL, ENTITIES, RESULT)
+        action, result, similarity = index.lookup(EMAIL.replace("Laurie Cartier", "Marie Paris"), ENTITIES)
+        self.assertGreaterEqual(similarity, index.reuse_threshold)
+        self.assertEqual(action, "hint")
+        self.assertIs(result, RESULT)
+        self.assertEqual(index.stats()["downgraded"], 1)
+
+    def test_downgrades_to_hint_when_only_a_reformatted_date_changed(self):
+        # The model returns the date as 2025-01-24, which does not appear in the mail
+        result = {**RESULT, "date": "2025-01-24"}
+        index = SimilarityIndex(max_entries=10, reuse_threshold=0.8)
+        index.add(EMAIL, ENTITIES, result)
+        action, previous, similarity = index.lookup(EMAIL.replace("vendredi 24 janvier", "vendredi 31 janvier"), ENTITIES)
+        self.assertGreaterEqual(similarity, index.reuse_threshold)
+        self.assertEqual(action, "hint")
+        self.assertIs(previous, result)
+        self.assertEqual(index.stats()["downgraded"], 1)
+
+    def test_hints_with_a_moderately_similar_mail(self):
+        edited = EMAIL.replace("le vendredi 24 janvier 2025 de 18h à 22h", "le samedi 8 mars 2025 de 14h à 17h")
+        edited = edited.replace("Les contes seraient-ils adaptés à ce public 11 ans et plus ?", "")
+        action, _, similarity = self.index.lookup(edited, ENTITIES)
+        self.assertEqual(action, "hint")
+        self.assertLess(similarity, self.index.reuse_threshold)
+        self.assertGreaterEqual(similarity, self.index.hint_threshold)
+
+    def test_misses_with_another_schema(self):
+        action, result, _ = self.index.lookup(EMAIL, {"name": ""})
+        self.assertIsNone(action)
+        self.assertIsNone(result)
+
+    def test_misses_with_an_unrelated_mail(self):
+        action, _, _ = self.index.lookup("Hello John, the invoice for $500 from ABC Company is due on Friday.", ENTITIES)
+        self.assertIsNone(action)
+        self.assertEqual(self.index.stats()["misses"], 1)
+
+    def test_accepts_a_precomputed_signature(self):
+        signature = self.index.signature(EMAIL)
+        self.assertEqual(self.index.lookup(EMAIL, ENTITIES, signature)[0], "reuse")
+
+
+class EvictionTest(unittest.TestCase):
+    def test_evicts_the_least_recently_used_entry(self):
+        index = SimilarityIndex(max_entries=2)
+        mails = [f"Demande de devis numéro {n} pour la bibliothèque de la ville {n * 7}, merci de votre réponse" for n in range(3)]
+        index.add(mails[0], ENTITIES, {"n": 0})
+        index.add(mails[1], ENTITIES, {"n": 1})
+        # Using the first entry makes the second one the least recently used
+        self.assertEqual(index.lookup(mails[0], ENTITIES)[1], {"n": 0})
+        index.add(mails[2], ENTITIES, {"n": 2})
+
+        stats = index.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evicted"], 1)
+        self.assertEqual(index.lookup(mails[0], ENTITIES)[1], {"n": 0})
+        self.assertEqual(index.lookup(mails[2], ENTITIES)[1], {"n": 2})
+        self.assertNotEqual(index.lookup(mails[1], ENTITIES)[1], {"n": 1})
+
+    def test_eviction_empties_the_lsh_buckets(self):
+        index = SimilarityIndex(max_entries=1)
+        index.add(EMAIL, ENTITIES, RESULT)
+        index.add("Hello John, the invoice for $500 from ABC Company is due on Friday.", ENTITIES, {})
+        self.assertEqual(len(index._buckets), index.bands)
+
+
+if __name__ == "__main__":
+    unittest.main()